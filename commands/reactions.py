@@ -5,6 +5,7 @@ import time
 from collections import deque
 import discord
 from main import reaction_queue  # Import reaction queue from main
+from utils.reply_queue import queue_reply
 
 # Reaction data
 laughter_triggers = ["haha", "lol", "lmao", "rofl", "hehe"]
@@ -55,19 +56,27 @@ MAX_COOLDOWNS = 1000
 cooldown_duration = 600  # 10 minutes
 
 def setup(client, cfg):
+    # Set log_handler_latency: true in config.yaml to log on_message timings at INFO
+    latency_log_level = logging.INFO if cfg.get("log_handler_latency", False) else logging.DEBUG
+
     @client.event
     async def on_message(message):
         if message.author.bot:
             return
+        start_time = time.perf_counter()
+        try:
+            await handle_message(message)
+        finally:
+            logging.log(latency_log_level, f"on_message handled in {(time.perf_counter() - start_time) * 1000:.2f}ms")
+
+    async def handle_message(message):
         message_lower = message.content.lower()
 
         # Random greeting (1% chance)
         if random.random() < 0.01:
             response = random.choice(greeting_responses)
-            try:
-                await message.channel.send(response)
-            except Exception as e:
-                logging.error(f"Error sending greeting response: {e}")
+            logging.info(f"Queued greeting response: {response}")
+            queue_reply(message, response, as_reply=False)
             return
 
         # Tenor GIF detection
@@ -92,11 +101,8 @@ def setup(client, cfg):
         # Laughter response
         if any(laugh in message_lower for laugh in laughter_triggers):
             response = random.choice(laughter_responses)
-            try:
-                logging.info(f"Sending laughter response: {response}")
-                await message.reply(response)
-            except Exception as e:
-                logging.error(f"Error sending laughter response: {e}")
+            logging.info(f"Queued laughter response: {response}")
+            queue_reply(message, response)
             return
 
         # Insult response with cooldown
@@ -118,12 +124,16 @@ def setup(client, cfg):
             if current_time - last_response_time >= cooldown_duration:
                 response_template = random.choice(insult_responses)
                 response = response_template.format(insult=detected_insult)
-                try:
-                    logging.info(f"Sending insult response: {response}")
-                    await message.reply(response)
-                    cooldowns[user_id] = current_time
-                except Exception as e:
-                    logging.error(f"Error sending insult response: {e}")
+                logging.info(f"Queued insult response: {response}")
+                # Reserve the cooldown now so a burst of insults only queues one retort,
+                # and give it back if the retort is never sent
+                cooldowns[user_id] = current_time
+
+                def release_cooldown():
+                    if cooldowns.get(user_id) == current_time:
+                        del cooldowns[user_id]
+
+                queue_reply(message, response, on_failed=release_cooldown)
                 return
 
         # Allow the bot to process commands and other on_message handlers
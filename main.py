@@ -8,6 +8,7 @@ from collections import deque
 import os
 import time
 from utils.config import get_config
+from utils.reply_queue import process_reply_queue, note_command
 
 # Enhanced logging configuration
 logging.basicConfig(
@@ -189,8 +190,14 @@ async def on_ready():
     await load_cogs()  # Now awaited
     asyncio.create_task(rotate_status())
     asyncio.create_task(process_reaction_queue())
+    asyncio.create_task(process_reply_queue())
     asyncio.create_task(cleanup_conversation_history())
 
+@discord_client.event
+async def on_command(ctx):
+    # Command replies go out directly; hold this channel's auto-replies behind them
+    note_command(ctx.channel.id)
+
 @discord_client.event
 async def on_resumed():
     logging.info('Connection resumed')
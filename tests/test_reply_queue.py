@@ -0,0 +1,311 @@
+import asyncio
+import sys
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from utils import reply_queue
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+class FakeMessage:
+    def __init__(self, channel, author_id):
+        self.channel = channel
+        self.author = SimpleNamespace(id=author_id)
+        self.replies = []
+
+    async def reply(self, content):
+        self.replies.append(content)
+
+
+def entry(message, response, as_reply=True, on_failed=None):
+    return (message, response, as_reply, 0.0, on_failed)
+
+
+def flush():
+    async def run():
+        await asyncio.gather(*reply_queue.flush_ready_replies())
+    asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    reply_queue.reply_queue.clear()
+    reply_queue.last_reply_times.clear()
+    reply_queue.last_command_times.clear()
+    reply_queue.flushing_channels.clear()
+    yield
+    reply_queue.reply_queue.clear()
+    reply_queue.last_reply_times.clear()
+    reply_queue.last_command_times.clear()
+
+
+def age_queue(channel_id, seconds):
+    pending = reply_queue.reply_queue[channel_id]
+    aged = [(m, r, a, t - seconds, cb) for m, r, a, t, cb in pending]
+    pending.clear()
+    pending.extend(aged)
+
+
+def test_coalesce_dedupes_and_replies_to_latest_from_same_author():
+    channel = FakeChannel(1)
+    first, second = FakeMessage(channel, 10), FakeMessage(channel, 10)
+    content, target, sent_channel, sent, leftover = reply_queue._coalesce_replies(
+        [entry(first, "LOL"), entry(second, "LOL"), entry(second, "heh")]
+    )
+    assert content == "LOL\nheh"
+    assert target is second
+    assert sent_channel is channel
+    assert len(sent) == 3
+    assert leftover == []
+
+
+def test_coalesce_mixed_authors_has_no_reply_target():
+    channel = FakeChannel(1)
+    alice, bob = FakeMessage(channel, 10), FakeMessage(channel, 20)
+    content, target, _, _, _ = reply_queue._coalesce_replies(
+        [entry(alice, "No, YOU'RE the idiot!"), entry(bob, "LOL")]
+    )
+    assert content == "No, YOU'RE the idiot!\nLOL"
+    assert target is None
+
+
+def test_coalesce_greeting_only_has_no_reply_target():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    _, target, _, _, _ = reply_queue._coalesce_replies([entry(message, "hello?", as_reply=False)])
+    assert target is None
+
+
+def test_coalesce_respects_message_length_cap():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    long_response = "a" * 1500
+    pending = [entry(message, long_response), entry(message, "b" * 600), entry(message, "short")]
+    content, _, _, sent, leftover = reply_queue._coalesce_replies(pending)
+    assert len(content) <= reply_queue.MAX_MESSAGE_LENGTH
+    assert content == long_response + "\nshort"
+    assert [e[1] for e in sent] == [long_response, "short"]
+    assert [e[1] for e in leftover] == ["b" * 600]
+
+
+def test_coalesce_truncates_single_oversized_response():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    content, _, _, sent, leftover = reply_queue._coalesce_replies([entry(message, "a" * 2500)])
+    assert len(content) == reply_queue.MAX_MESSAGE_LENGTH
+    assert len(sent) == 1
+    assert leftover == []
+
+
+def test_flush_sends_burst_once():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    failed = []
+    reply_queue.queue_reply(message, "LOL")
+    reply_queue.queue_reply(message, "heh", on_failed=lambda: failed.append(True))
+
+    # Still inside the coalesce window: nothing goes out
+    flush()
+    assert message.replies == []
+
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+    flush()
+    assert message.replies == ["LOL\nheh"]
+    assert failed == []
+    assert 1 not in reply_queue.reply_queue
+
+
+def test_flush_waits_for_channel_interval_and_commands():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    reply_queue.queue_reply(message, "LOL")
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+
+    reply_queue.last_reply_times[1] = time.monotonic()
+    flush()
+    assert message.replies == []
+
+    reply_queue.last_reply_times.clear()
+    reply_queue.note_command(1)
+    flush()
+    assert message.replies == []
+
+    reply_queue.last_command_times.clear()
+    flush()
+    assert message.replies == ["LOL"]
+
+
+def test_flush_survives_channel_evicted_during_send():
+    first_channel, second_channel = FakeChannel(1), FakeChannel(2)
+    second = FakeMessage(second_channel, 20)
+
+    class EvictingMessage(FakeMessage):
+        async def reply(self, content):
+            await super().reply(content)
+            reply_queue.reply_queue.pop(2, None)
+
+    first = EvictingMessage(first_channel, 10)
+    reply_queue.queue_reply(first, "LOL")
+    reply_queue.queue_reply(second, "heh")
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+    age_queue(2, reply_queue.REPLY_COALESCE_WINDOW)
+
+    flush()
+    assert first.replies == ["LOL"]
+    assert second.replies == ["heh"]
+    flush()
+
+
+def test_requeue_keeps_newest_entries():
+    channel = FakeChannel(1)
+    message = FakeMessage(channel, 10)
+    old = [entry(message, f"old{i}") for i in range(6)]
+    for i in range(6):
+        reply_queue.queue_reply(message, f"new{i}")
+    reply_queue._requeue(1, old)
+    responses = [e[1] for e in reply_queue.reply_queue[1]]
+    assert len(responses) == reply_queue.MAX_QUEUED_REPLIES
+    assert responses[-6:] == [f"new{i}" for i in range(6)]
+    assert responses[0] == "old2"
+
+
+def test_rate_limited_send_is_requeued():
+    from discord import HTTPException
+
+    channel = FakeChannel(1)
+
+    class RateLimitedMessage(FakeMessage):
+        async def reply(self, content):
+            raise HTTPException(SimpleNamespace(status=429, reason="Too Many Requests"), "")
+
+    message = RateLimitedMessage(channel, 10)
+    failed = []
+    reply_queue.queue_reply(message, "LOL", on_failed=lambda: failed.append(True))
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+
+    flush()
+    assert [e[1] for e in reply_queue.reply_queue[1]] == ["LOL"]
+    assert failed == []
+
+
+def test_failed_send_runs_on_failed():
+    from discord import HTTPException
+
+    class BrokenMessage(FakeMessage):
+        async def reply(self, content):
+            raise HTTPException(SimpleNamespace(status=403, reason="Forbidden"), "")
+
+    message = BrokenMessage(FakeChannel(1), 10)
+    failed = []
+    reply_queue.queue_reply(message, "LOL", on_failed=lambda: failed.append(True))
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+
+    flush()
+    assert failed == [True]
+    assert 1 not in reply_queue.reply_queue
+
+
+def test_queue_overflow_runs_on_failed_for_oldest():
+    message = FakeMessage(FakeChannel(1), 10)
+    failed = []
+    reply_queue.queue_reply(message, "first", on_failed=lambda: failed.append("first"))
+    for i in range(reply_queue.MAX_QUEUED_REPLIES):
+        reply_queue.queue_reply(message, f"r{i}")
+    assert failed == ["first"]
+    assert reply_queue.reply_queue[1][0][1] == "r0"
+
+
+def test_slow_channel_does_not_block_others():
+    release = None
+
+    class SlowMessage(FakeMessage):
+        async def reply(self, content):
+            await release.wait()
+            await super().reply(content)
+
+    slow = SlowMessage(FakeChannel(1), 10)
+    fast = FakeMessage(FakeChannel(2), 20)
+    reply_queue.queue_reply(slow, "LOL")
+    reply_queue.queue_reply(fast, "heh")
+    age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+    age_queue(2, reply_queue.REPLY_COALESCE_WINDOW)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        tasks = reply_queue.flush_ready_replies()
+        await asyncio.sleep(0.01)
+        assert fast.replies == ["heh"]
+        assert slow.replies == []
+
+        # A second pass must not start another send for the busy channel
+        reply_queue.queue_reply(slow, "heh")
+        age_queue(1, reply_queue.REPLY_COALESCE_WINDOW)
+        assert reply_queue.flush_ready_replies() == []
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert slow.replies == ["LOL"]
+    assert 1 not in reply_queue.flushing_channels
+
+
+def test_channel_times_are_pruned():
+    now = time.monotonic()
+    reply_queue.last_reply_times[1] = now - reply_queue.CHANNEL_TIMES_TTL - 1
+    reply_queue.last_reply_times[2] = now
+    reply_queue.last_command_times[3] = now - reply_queue.CHANNEL_TIMES_TTL - 1
+    reply_queue.last_command_times[4] = now
+
+    flush()
+    assert list(reply_queue.last_reply_times) == [2]
+    assert list(reply_queue.last_command_times) == [4]
+
+
+def test_insult_burst_queues_one_retort(monkeypatch):
+    monkeypatch.setitem(sys.modules, "main", SimpleNamespace(reaction_queue=deque()))
+    monkeypatch.delitem(sys.modules, "commands.reactions", raising=False)
+    from commands import reactions
+    monkeypatch.setattr(reactions.random, "random", lambda: 0.5)
+    reactions.cooldowns.clear()
+
+    handlers = {}
+
+    async def process_commands(message):
+        pass
+
+    client = SimpleNamespace(event=lambda f: handlers.setdefault(f.__name__, f), process_commands=process_commands)
+    reactions.setup(client, {})
+
+    channel = FakeChannel(1)
+
+    def insult():
+        message = FakeMessage(channel, 10)
+        message.content = "you idiot"
+        message.embeds = []
+        message.author.bot = False
+        return message
+
+    async def run():
+        await handlers["on_message"](insult())
+        await handlers["on_message"](insult())
+
+    asyncio.run(run())
+    assert len(reply_queue.reply_queue[1]) == 1
+    assert 10 in reactions.cooldowns
+
+    # A retort that is never sent gives the cooldown back
+    reply_queue._drop(reply_queue.reply_queue.pop(1))
+    assert 10 not in reactions.cooldowns
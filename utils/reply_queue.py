@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from discord import HTTPException
+
+# Reply queue for auto-responses: {channel_id: deque of (message, response, as_reply, queued_at, on_failed)}
+# Lives outside main.py so that running `python main.py` and importing it from
+# commands/ share the same state.
+reply_queue = {}
+MAX_QUEUED_REPLIES = 10  # Per channel, oldest dropped first
+MAX_REPLY_CHANNELS = 1000
+MAX_MESSAGE_LENGTH = 2000
+MAX_CONCURRENT_REPLIES = 5
+REPLY_COALESCE_WINDOW = 2.0  # Bursts inside this window collapse into one message
+REPLY_CHANNEL_INTERVAL = 5.0  # Minimum gap between auto-replies in a channel
+COMMAND_PRIORITY_WINDOW = 2.0  # Hold auto-replies while a command is replying
+CHANNEL_TIMES_TTL = max(REPLY_CHANNEL_INTERVAL, COMMAND_PRIORITY_WINDOW)
+last_reply_times = {}
+last_command_times = {}
+reply_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REPLIES)
+flushing_channels = set()  # At most one send in flight per channel
+flush_tasks = set()
+
+def _drop(entries):
+    # Let callers roll back anything they reserved for a reply that will never be sent
+    for entry in entries:
+        on_failed = entry[4]
+        if on_failed is not None:
+            try:
+                on_failed()
+            except Exception as e:
+                logging.error(f"Error rolling back dropped auto-response: {e}")
+
+def queue_reply(message, response, as_reply=True, on_failed=None):
+    channel_id = message.channel.id
+    if channel_id not in reply_queue and len(reply_queue) >= MAX_REPLY_CHANNELS:
+        oldest_channel = next(iter(reply_queue))
+        _drop(reply_queue.pop(oldest_channel))
+        logging.info(f"Dropped queued replies for channel {oldest_channel}")
+    pending = reply_queue.setdefault(channel_id, deque(maxlen=MAX_QUEUED_REPLIES))
+    if len(pending) == pending.maxlen:
+        _drop([pending[0]])
+    pending.append((message, response, as_reply, time.monotonic(), on_failed))
+
+def note_command(channel_id):
+    last_command_times[channel_id] = time.monotonic()
+def _coalesce_replies(pending):
+    """Merge a channel's pending entries into (content, reply_target, channel, sent_entries, leftover).
+
+    Responses are de-duplicated and kept whole; entries that no longer fit in
+    one message go to leftover for the next send. Only reply to a message when every
+    included reply comes from the same author, so a retort is never pinned to
+    someone else's message.
+    """
+    responses = []
+    sent_entries = []
+    leftover = []
+    length = 0
+    for entry in pending:
+        response = entry[1]
+        if response not in responses:
+            added = len(response) + (1 if responses else 0)
+            if length + added > MAX_MESSAGE_LENGTH:
+                if responses:
+                    leftover.append(entry)
+                    continue
+                response = response[:MAX_MESSAGE_LENGTH]
+                added = len(response)
+            responses.append(response)
+            length += added
+        sent_entries.append(entry)
+    content = "\n".join(responses)
+    reply_targets = [message for message, _, as_reply, _, _ in sent_entries if as_reply]
+    authors = {message.author.id for message in reply_targets}
+    target = reply_targets[-1] if len(authors) == 1 else None
+    return content, target, pending[-1][0].channel, sent_entries, leftover
+
+def _requeue(channel_id, pending):
+    merged = list(pending) + list(reply_queue.get(channel_id, ()))
+    # Trim from the left, so the oldest entries are dropped
+    _drop(merged[:-MAX_QUEUED_REPLIES])
+    reply_queue[channel_id] = deque(merged[-MAX_QUEUED_REPLIES:], maxlen=MAX_QUEUED_REPLIES)
+
+def _prune_channel_times(current_time):
+    for times in (last_reply_times, last_command_times):
+        expired = [channel_id for channel_id, t in times.items() if current_time - t > CHANNEL_TIMES_TTL]
+        for channel_id in expired:
+            del times[channel_id]
+
+async def _flush_channel(channel_id, pending):
+    content, target, channel, sent_entries, leftover = _coalesce_replies(pending)
+    try:
+        if target is not None:
+            await target.reply(content)
+        else:
+            await channel.send(content)
+    except HTTPException as e:
+        if e.status == 429:
+            retry_after = getattr(e, "retry_after", None) or 1.0
+            logging.warning(f"Rate limit hit sending auto-response, retrying after {retry_after}s")
+            _requeue(channel_id, pending)
+            last_reply_times[channel_id] = time.monotonic() + retry_after - REPLY_CHANNEL_INTERVAL
+        else:
+            logging.error(f"Error sending auto-response: {e}")
+            _drop(pending)
+        return
+    except Exception as e:
+        logging.error(f"Unexpected error sending auto-response to channel {channel_id}: {e}")
+        _drop(pending)
+        return
+    last_reply_times[channel_id] = time.monotonic()
+    if leftover:
+        _requeue(channel_id, leftover)
+    logging.info(f"Sent {len(sent_entries)} coalesced auto-response(s) to channel {channel_id}")
+
+async def _flush_channel_task(channel_id, pending):
+    try:
+        async with reply_semaphore:
+            await _flush_channel(channel_id, pending)
+    finally:
+        flushing_channels.discard(channel_id)
+
+def flush_ready_replies():
+    """Start a send task for every channel whose queued replies are due, and return the tasks."""
+    _prune_channel_times(time.monotonic())
+    started = []
+    for channel_id in list(reply_queue):
+        try:
+            if channel_id in flushing_channels:
+                continue
+            pending = reply_queue.get(channel_id)
+            if pending is None:
+                continue
+            if not pending:
+                del reply_queue[channel_id]
+                continue
+            current_time = time.monotonic()
+            if current_time - pending[0][3] < REPLY_COALESCE_WINDOW:
+                continue
+            if current_time - last_reply_times.get(channel_id, float("-inf")) < REPLY_CHANNEL_INTERVAL:
+                continue
+            if current_time - last_command_times.get(channel_id, float("-inf")) < COMMAND_PRIORITY_WINDOW:
+                continue
+            del reply_queue[channel_id]
+            flushing_channels.add(channel_id)
+            task = asyncio.create_task(_flush_channel_task(channel_id, pending))
+            flush_tasks.add(task)
+            task.add_done_callback(flush_tasks.discard)
+            started.append(task)
+        except Exception as e:
+            logging.error(f"Unexpected error scheduling auto-response for channel {channel_id}: {e}")
+    return started
+
+# Background task for sending queued auto-responses
+async def process_reply_queue():
+    while True:
+        await asyncio.sleep(0.1)
+        flush_ready_replies()